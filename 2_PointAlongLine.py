@@ -70,7 +70,7 @@ def generate_analysis_points(parks_layer, streets_layer, output_gdb, include_sma
 
         # --- Step 1: Aggregate input park polygons ---
         arcpy.AddMessage("Aggregating park polygons (10m threshold)...")
-        aggregated_parks = "in_memory/aggregated_parks"
+        aggregated_parks = "memory/aggregated_parks"
         temp_layers.append(aggregated_parks)
         arcpy.cartography.AggregatePolygons(
             in_features=parks_layer,
@@ -90,14 +90,14 @@ def generate_analysis_points(parks_layer, streets_layer, output_gdb, include_sma
         arcpy.management.CalculateField(aggregated_parks, area_field, "!shape.area!", "PYTHON3")
 
         # --- Step 3: Create layers for different park categories based on size ---
-        parks_large = "in_memory/parks_large"
+        parks_large = "memory/parks_large"
         temp_layers.append(parks_large)
         arcpy.analysis.Select(aggregated_parks, parks_large, f'"{area_field}" >= 10000')
         arcpy.AddMessage(f"Parks ≥ 1 ha (P1HA): {int(arcpy.management.GetCount(parks_large)[0]):,}")
 
         parks_all = ""
         if include_small_parks:
-            parks_all = "in_memory/parks_all"
+            parks_all = "memory/parks_all"
             temp_layers.append(parks_all)
             arcpy.management.CopyFeatures(aggregated_parks, parks_all)
             arcpy.AddMessage(f"All parks (ALLP): {int(arcpy.management.GetCount(parks_all)[0]):,}")
@@ -110,8 +110,8 @@ def generate_analysis_points(parks_layer, streets_layer, output_gdb, include_sma
             arcpy.AddMessage(f"--- Processing: {label} ---")
             
             # Create temporary layers for boundaries and points.
-            boundaries = f"in_memory/boundaries_{suffix}"
-            points = f"in_memory/points_{suffix}"
+            boundaries = f"memory/boundaries_{suffix}"
+            points = f"memory/points_{suffix}"
             points_lyr = f"points_lyr_{suffix}"
             temp_layers.extend([boundaries, points])
 
@@ -63,6 +63,8 @@ def analyze_accessibility(accessibility_fc, input_fc, population_field, group_fi
     output_points_fc = os.path.join(output_gdb, f"points_accessibility_{suffix}")
     output_districts_fc = os.path.join(output_gdb, f"districts_accessibility_{suffix}")
     output_folder = os.path.dirname(output_gdb)
+    # Intermediate tables only feed the joins below, so keep them in RAM.
+    scratch = "memory"
 
     arcpy.AddMessage("\n===================================================")
     arcpy.AddMessage("===      PARK ACCESSIBILITY ANALYSIS START      ===")
@@ -85,6 +87,17 @@ def analyze_accessibility(accessibility_fc, input_fc, population_field, group_fi
     )
     arcpy.AddMessage("Coordinate systems validated.")
 
+    # --- Merge overlapping accessibility polygons ---
+    # Points and districts are then tested against one (multipart) polygon, and
+    # overlapping service areas are not counted twice in the accessible area.
+    temp_layers = []
+    access_union = accessibility_fc
+    if int(arcpy.management.GetCount(accessibility_fc)[0]) > 1:
+        arcpy.AddMessage("Dissolving accessibility polygons into a single feature...")
+        access_union = os.path.join(scratch, f"access_union_{suffix}")
+        temp_layers.append(access_union)
+        arcpy.analysis.PairwiseDissolve(accessibility_fc, access_union, multi_part="MULTI_PART")
+
     # --- Determine accessible points using Spatial Join ---
     if not arcpy.Exists(output_points_fc):
         arcpy.AddMessage(f"Creating points accessibility layer: {output_points_fc}")
@@ -95,19 +108,25 @@ def analyze_accessibility(accessibility_fc, input_fc, population_field, group_fi
     else:
         arcpy.AddMessage(f"Using existing points accessibility layer: {output_points_fc}")
 
+    # Read the field names once; the checks below are simple set lookups.
+    point_fields = {f.name for f in arcpy.ListFields(output_points_fc)}
+
     # --- Mark points inside the accessibility area ---
     arcpy.management.MakeFeatureLayer(output_points_fc, "output_layer_temp")
-    if "near_park" not in [f.name for f in arcpy.ListFields(output_points_fc)]:
+    if "near_park" not in point_fields:
         arcpy.management.AddField(output_points_fc, "near_park", "SHORT")
-    arcpy.management.SelectLayerByLocation("output_layer_temp", "WITHIN", accessibility_fc)
-    arcpy.management.CalculateField("output_layer_temp", "near_park", 1, "PYTHON3")
+    arcpy.management.SelectLayerByLocation("output_layer_temp", "WITHIN", access_union)
+    # Writing a constant needs no expression engine; the cursor visits only the selected points.
+    with arcpy.da.UpdateCursor("output_layer_temp", ["near_park"]) as cursor:
+        for row in cursor:
+            cursor.updateRow([1])
     arcpy.management.SelectLayerByAttribute("output_layer_temp", "CLEAR_SELECTION")
 
     # --- Prepare a copy of the districts layer for results ---
     arcpy.management.CopyFeatures(districts_fc, output_districts_fc)
 
     # --- Find or calculate the area for each district ---
-    district_fields = [f.name for f in arcpy.ListFields(output_districts_fc)]
+    district_fields = {f.name for f in arcpy.ListFields(output_districts_fc)}
     area_field_name = None
     common_area_names = ["Shape_Area", "SHAPE_Area", "Area"]
     if area_field and area_field.strip() in district_fields:
@@ -124,7 +143,6 @@ def analyze_accessibility(accessibility_fc, input_fc, population_field, group_fi
     arcpy.AddMessage(f"Using '{area_field_name}' as the district area field.")
 
     # --- Optimized Analysis Workflow ---
-    temp_layers = []
     try:
         # Create a layer of only accessible points.
         accessible_points_lyr = "accessible_points_lyr"
@@ -132,14 +150,13 @@ def analyze_accessibility(accessibility_fc, input_fc, population_field, group_fi
         temp_layers.append(accessible_points_lyr)
         
         # Determine if population data is available for the analysis.
-        existing_fields = [f.name for f in arcpy.ListFields(output_points_fc)]
-        has_population_field = population_field in existing_fields
+        has_population_field = population_field in point_fields
         sum_fields = [[population_field, "SUM"]] if has_population_field else []
 
         # --- 1. Summarize total and accessible points/population per district ---
         arcpy.AddMessage("Summarizing points and population within districts...")
-        summary_total = os.path.join(output_gdb, f"summary_total_{suffix}")
-        summary_accessible = os.path.join(output_gdb, f"summary_accessible_{suffix}")
+        summary_total = os.path.join(scratch, f"summary_total_{suffix}")
+        summary_accessible = os.path.join(scratch, f"summary_accessible_{suffix}")
         temp_layers.extend([summary_total, summary_accessible])
         
         arcpy.analysis.SummarizeWithin(districts_fc, output_points_fc, summary_total, "KEEP_ALL", sum_fields, group_field=district_field)
@@ -147,71 +164,78 @@ def analyze_accessibility(accessibility_fc, input_fc, population_field, group_fi
 
         # --- 2. Calculate the accessible area within each district ---
         arcpy.AddMessage("Calculating accessible area per district...")
-        intersect_result = os.path.join(output_gdb, f"intersect_area_{suffix}")
-        temp_layers.append(intersect_result)
-        arcpy.analysis.Intersect([districts_fc, accessibility_fc], intersect_result)
+        intersect_result = os.path.join(scratch, f"intersect_area_{suffix}")
+        area_summary = os.path.join(scratch, f"area_summary_{suffix}")
+        temp_layers.extend([intersect_result, area_summary])
+        arcpy.analysis.PairwiseIntersect([districts_fc, access_union], intersect_result)
         arcpy.management.AddField(intersect_result, "AccessibleArea", "DOUBLE")
         arcpy.management.CalculateGeometryAttributes(intersect_result, [["AccessibleArea", "AREA"]], area_unit="SQUARE_METERS")
+        # A district can be cut into several pieces, so sum the pieces before joining.
+        arcpy.analysis.Statistics(intersect_result, area_summary, [["AccessibleArea", "SUM"]], district_field)
         
         # --- 3. Join all summarized results to the output districts layer ---
         arcpy.AddMessage("Joining results to districts layer...")
         arcpy.management.JoinField(output_districts_fc, district_field, summary_total, district_field, ["Point_Count"] + ([f"Sum_{population_field}"] if has_population_field else []))
         arcpy.management.JoinField(output_districts_fc, district_field, summary_accessible, district_field, ["Point_Count"] + ([f"Sum_{population_field}"] if has_population_field else []))
-        arcpy.management.JoinField(output_districts_fc, district_field, intersect_result, district_field, ["AccessibleArea"])
+        arcpy.management.JoinField(output_districts_fc, district_field, area_summary, district_field, ["SUM_AccessibleArea"])
 
-        # --- 4. Rename fields and calculate final percentages ---
+        # --- 4. Rename joined fields ---
         arcpy.AddMessage("Calculating final statistics...")
         field_mappings = {
             "Point_Count": "Total_Points", "Point_Count_1": "Accessible_Points",
-            f"Sum_{population_field}": "Total_Population", f"Sum_{population_field}_1": "Accessible_Population"
+            f"Sum_{population_field}": "Total_Population", f"Sum_{population_field}_1": "Accessible_Population",
+            "SUM_AccessibleArea": "AccessibleArea"
         }
+        # Field names are matched case-insensitively, as ListFields wildcards are
+        # (SummarizeWithin writes e.g. "SUM_pop" for "Sum_pop").
+        output_fields = {f.name.lower(): f.name for f in arcpy.ListFields(output_districts_fc)}
         for old_name, new_name in field_mappings.items():
-            if arcpy.ListFields(output_districts_fc, old_name):
-                arcpy.management.AlterField(output_districts_fc, old_name, new_name, new_name)
+            actual_name = output_fields.pop(old_name.lower(), None)
+            if actual_name:
+                arcpy.management.AlterField(output_districts_fc, actual_name, new_name, new_name)
+                output_fields[new_name.lower()] = new_name
         
         arcpy.management.AddField(output_districts_fc, "Area_Covered_Percent", "DOUBLE")
-        arcpy.management.CalculateField(output_districts_fc, "Area_Covered_Percent", f"(!AccessibleArea! / !{area_field_name}!) * 100 if !{area_field_name}! > 0 else 0", "PYTHON3")
 
-        # --- 5. Generate Text and CSV Reports ---
+        # --- 5. Calculate area coverage and generate Text and CSV Reports ---
         arcpy.AddMessage("Generating reports...")
-        report_fields = [district_field, "Area_Covered_Percent", "Total_Points", "Accessible_Points"]
+        # The counted quantity depends only on the input layout, so pick its fields once
+        # instead of branching on every district row.
         if has_population_field:
-            report_fields += ["Total_Population", "Accessible_Population"]
-        
-        txt_lines = [f"PARK ACCESSIBILITY ANALYSIS ({distance_label}m)", "="*60]
-        csv_lines = []
-        csv_header = ["District", "Area_Covered_Percent"] + (["Population_Accessible"] if has_population_field else ["Points_Accessible"])
-
-        with arcpy.da.SearchCursor(output_districts_fc, [f for f in report_fields if arcpy.ListFields(output_districts_fc, f)]) as cursor:
-            for row in cursor:
-                row_dict = dict(zip(cursor.fields, row))
-                name = row_dict.get(district_field, "N/A")
-                area_pct = row_dict.get("Area_Covered_Percent", 0) or 0
-                
-                txt_lines.append(f"\n--- {name} ---")
-                txt_lines.append(f"Area Covered: {area_pct:.2f} %")
-                
-                if has_population_field:
-                    total_pop = row_dict.get("Total_Population", 0) or 0
-                    access_pop = row_dict.get("Accessible_Population", 0) or 0
-                    txt_lines.append(f"Population: {int(access_pop)} / {int(total_pop)} accessible")
-                    csv_lines.append([name, area_pct, access_pop])
-                else:
-                    total_pts = row_dict.get("Total_Points", 0) or 0
-                    access_pts = row_dict.get("Accessible_Points", 0) or 0
-                    txt_lines.append(f"Points: {int(access_pts)} / {int(total_pts)} accessible")
-                    csv_lines.append([name, area_pct, access_pts])
-
-        # --- Save report files ---
+            total_key, access_key, count_label = "Total_Population", "Accessible_Population", "Population"
+        else:
+            total_key, access_key, count_label = "Total_Points", "Accessible_Points", "Points"
+        # Area_Covered_Percent is filled in the same pass that writes the reports.
+        report_fields = [district_field, "AccessibleArea", area_field_name, "Area_Covered_Percent"]
+        report_fields += [f for f in (total_key, access_key) if f.lower() in output_fields]
+
         timestamp = datetime.now().strftime("%Y%m%d_%H%M")
         txt_path = os.path.join(output_folder, f"accessibility_summary_{suffix}_{timestamp}.txt")
         csv_path = os.path.join(output_folder, f"accessibility_summary_{suffix}_{timestamp}.csv")
 
-        with open(txt_path, "w", encoding="utf-8") as f: f.write("\n".join(txt_lines))
-        with open(csv_path, "w", encoding="utf-8", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(csv_header)
-            writer.writerows(csv_lines)
+        # Both reports are written row by row as the districts are read.
+        with open(txt_path, "w", encoding="utf-8") as txt_file, open(csv_path, "w", encoding="utf-8", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(["District", "Area_Covered_Percent", f"{count_label}_Accessible"])
+            txt_file.write(f"PARK ACCESSIBILITY ANALYSIS ({distance_label}m)\n{'=' * 60}\n")
+
+            with arcpy.da.UpdateCursor(output_districts_fc, report_fields) as cursor:
+                for row in cursor:
+                    row_dict = dict(zip(report_fields, row))
+                    name = row_dict.get(district_field, "N/A")
+                    accessible_area = row_dict["AccessibleArea"] or 0
+                    district_area = row_dict[area_field_name] or 0
+                    area_pct = (accessible_area / district_area) * 100 if district_area > 0 else 0
+                    row[3] = area_pct
+                    cursor.updateRow(row)
+
+                    total = row_dict.get(total_key, 0) or 0
+                    accessible = row_dict.get(access_key, 0) or 0
+
+                    txt_file.write(f"\n--- {name} ---\n")
+                    txt_file.write(f"Area Covered: {area_pct:.2f} %\n")
+                    txt_file.write(f"{count_label}: {int(accessible)} / {int(total)} accessible\n")
+                    writer.writerow([name, area_pct, accessible])
             
         arcpy.AddMessage(f"TXT Report: {txt_path}")
         arcpy.AddMessage(f"CSV Report: {csv_path}")
@@ -4,12 +4,94 @@
 # ------------------------------------
 
 import arcpy
+import math
+import numpy as np
 import sys
 import os
 
 # Allow overwriting outputs.
 arcpy.env.overwriteOutput = True
 
+# Vertex offsets of a flat-topped hexagon with unit side length, listed clockwise
+# as required for outer rings. Scaled by the side length for each run.
+_HEX_UNIT_OFFSETS = np.stack([np.cos(-np.arange(6) * np.pi / 3), np.sin(-np.arange(6) * np.pi / 3)], axis=1)
+
+# Little-endian OGC WKB layout of a single-ring polygon with 7 points (6 vertices + closing point).
+_WKB_HEX_DTYPE = np.dtype([("byte_order", "u1"), ("geometry_type", "<u4"), ("ring_count", "<u4"),
+                           ("point_count", "<u4"), ("coords", "<f8", (7, 2))])
+
+# ------------------------------------
+# Function to find hexagon centres near the boundary polygons
+# ------------------------------------
+def select_centers_near(centers, boundary_fc, distance, spatial_ref):
+    """
+    Returns the indices of the centres that lie within the given distance of the boundary polygons.
+    The test runs as a single SelectLayerByLocation on a temporary point layer.
+    """
+    points = "memory/hex_centers"
+    points_lyr = "hex_centers_lyr"
+    center_arr = np.zeros(len(centers), dtype=[("center_idx", np.int32), ("x", np.float64), ("y", np.float64)])
+    center_arr["center_idx"] = np.arange(len(centers))
+    center_arr["x"] = centers[:, 0]
+    center_arr["y"] = centers[:, 1]
+    try:
+        arcpy.da.NumPyArrayToFeatureClass(center_arr, points, ["x", "y"], spatial_ref)
+        arcpy.management.MakeFeatureLayer(points, points_lyr)
+        arcpy.management.SelectLayerByLocation(points_lyr, "WITHIN_A_DISTANCE", boundary_fc, str(distance))
+        return np.sort(arcpy.da.FeatureClassToNumPyArray(points_lyr, ["center_idx"])["center_idx"])
+    finally:
+        for item in [points_lyr, points]:
+            if arcpy.Exists(item):
+                arcpy.management.Delete(item)
+
+# ------------------------------------
+# Function to build a hexagonal grid from computed hexagon centres
+# ------------------------------------
+def make_hex_grid(out_fc, extent, hex_area, spatial_ref, boundary_fc):
+    """
+    Creates a polygon feature class of flat-topped hexagons covering the extent.
+    The hexagon area is given in square map units of the spatial reference.
+    Only hexagons that can touch the boundary polygons are built. Centres, vertices and the WKB
+    of every hexagon are computed with NumPy and written with a single InsertCursor.
+    Returns the number of hexagons created.
+    """
+    # Side length of a regular hexagon with the requested area (A = 3 * sqrt(3) / 2 * s^2).
+    side = math.sqrt(2 * hex_area / (3 * math.sqrt(3)))
+    half_height = math.sqrt(3) / 2 * side
+
+    # Columns are 1.5 sides apart and odd columns are shifted up by half a hexagon height,
+    # so the first and last rows/columns reach just past the extent on every side.
+    cols = np.arange(extent.XMin, extent.XMax + 1.5 * side, 1.5 * side)
+    rows = np.arange(extent.YMin - half_height, extent.YMax + 2 * half_height, 2 * half_height)
+    col_idx, row_idx = np.meshgrid(np.arange(cols.size), np.arange(rows.size), indexing="ij")
+    centers = np.stack([cols[col_idx].ravel(), (rows[row_idx] + (col_idx % 2) * half_height).ravel()], axis=1)
+    grid_ids = np.stack([col_idx.ravel() + 1, row_idx.ravel() + 1], axis=1)
+
+    # Every point of a hexagon lies within one side length of its centre, so centres farther
+    # than that from the boundary belong to hexagons the clip would discard anyway.
+    keep = select_centers_near(centers, boundary_fc, side, spatial_ref)
+    centers = centers[keep]
+    grid_ids = grid_ids[keep]
+
+    vertices = centers[:, None, :] + side * _HEX_UNIT_OFFSETS[None, :, :]
+
+    # Encode all hexagons into one WKB buffer instead of building arcpy Point/Array/Polygon objects.
+    hex_wkb = np.zeros(len(vertices), dtype=_WKB_HEX_DTYPE)
+    hex_wkb["byte_order"] = 1
+    hex_wkb["geometry_type"] = 3
+    hex_wkb["ring_count"] = 1
+    hex_wkb["point_count"] = 7
+    hex_wkb["coords"][:, :6] = vertices
+    hex_wkb["coords"][:, 6] = vertices[:, 0]
+
+    arcpy.management.CreateFeatureclass(os.path.dirname(out_fc), os.path.basename(out_fc), "POLYGON", spatial_reference=spatial_ref)
+    arcpy.management.AddField(out_fc, "GRID_ID", "TEXT", field_length=20)
+    with arcpy.da.InsertCursor(out_fc, ["SHAPE@WKB", "GRID_ID"]) as cursor:
+        for record, (col, row) in zip(hex_wkb, grid_ids):
+            cursor.insertRow([bytearray(record.tobytes()), f"{col}-{row}"])
+
+    return len(hex_wkb)
+
 # ------------------------------------
 # Get input parameters from the ArcGIS tool dialog
 # ------------------------------------
@@ -42,15 +124,15 @@ final_output_path = os.path.join(workspace, output_feature)
 arcpy.AddMessage(f"Final output path:    {final_output_path}")
 
 # --- Validate input feature ---
-if not arcpy.Exists(input_feature):
+try:
+    desc = arcpy.Describe(input_feature)
+except OSError:
     raise arcpy.ExecuteError(f"Input feature '{input_feature}' does not exist.")
-desc = arcpy.Describe(input_feature)
 if desc.shapeType != "Polygon":
     raise arcpy.ExecuteError(f"Input must be a polygon layer, but got {desc.shapeType}.")
 
 # --- Get extent and spatial reference from input ---
 extent        = desc.extent
-extent_string = f"{extent.XMin} {extent.YMin} {extent.XMax} {extent.YMax}"
 spatial_ref   = desc.spatialReference
 
 # --- Validate coordinate system ---
@@ -63,26 +145,24 @@ try:
     hex_size_val = float(hex_size_value)
     if hex_size_val <= 0:
         raise ValueError
-    hex_size = f"{hex_size_val} Hectares"
+    # Work in the units of the coordinate system, so the grid is also correct for feet-based systems.
+    hex_area = hex_size_val * 10000 / spatial_ref.metersPerUnit ** 2  # Square map units
 except (ValueError, TypeError):
     raise arcpy.ExecuteError("Hexagon size must be a positive number.")
 
 # ------------------------------------
-# Generate hexagonal tessellation
+# Generate hexagonal grid
 # ------------------------------------
 arcpy.AddMessage("Generating hexagonal grid...")
-temp_hex = "in_memory/temp_hex"
-arcpy.management.GenerateTessellation(temp_hex, extent_string, "HEXAGON", hex_size, spatial_ref)
-
-if not arcpy.Exists(temp_hex):
-    raise arcpy.ExecuteError("Hexagon generation failed.")
-arcpy.AddMessage("Hexagonal grid generated successfully.")
+temp_hex = "memory/temp_hex"
+hex_count = make_hex_grid(temp_hex, extent, hex_area, spatial_ref, input_feature)
+arcpy.AddMessage(f"Hexagonal grid generated successfully ({hex_count:,} hexagons).")
 
 # ------------------------------------
 # Clip hexagons to the input boundary
 # ------------------------------------
 arcpy.AddMessage("Clipping hexagons to the input feature boundary...")
-arcpy.analysis.Clip(temp_hex, input_feature, final_output_path)
+arcpy.analysis.PairwiseClip(temp_hex, input_feature, final_output_path)
 arcpy.AddMessage(f"Clipped hexagons saved to: {final_output_path}")
 
 # --- Try to add the result to the current map ---
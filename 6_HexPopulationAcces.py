@@ -3,25 +3,28 @@
 # Purpose: Calculates population and accessibility statistics for each hexagon.
 # ------------------------------------
 import arcpy
+import numpy as np
+import os
 import sys
 
 # Allow overwriting outputs.
 arcpy.env.overwriteOutput = True
 
+# Point inputs above this size are staged in the scratch geodatabase instead of in RAM.
+LARGE_POINT_COUNT = 5000000
+
 # ------------------------------------
 # Function to reproject a layer if its CRS doesn't match a target CRS
 # ------------------------------------
-def reproject_layer_if_needed(layer_path, target_sr, layer_name):
+def reproject_layer_if_needed(layer_path, source_sr, target_sr, layer_name):
     """
     Reprojects a layer to a target spatial reference if they do not match.
+    The caller passes the layer's already described spatial reference.
     Returns the path to the reprojected layer (or the original path if no reprojection was needed).
     """
     try:
-        desc = arcpy.Describe(layer_path)
-        source_sr = desc.spatialReference
-        
         if source_sr.factoryCode != target_sr.factoryCode:
-            output_layer = f"in_memory/{layer_name}_reprojected"
+            output_layer = f"memory/{layer_name}_reprojected"
             arcpy.AddMessage(f"Reprojecting '{layer_name}' to '{target_sr.name}'...")
             arcpy.management.Project(layer_path, output_layer, target_sr)
             return output_layer
@@ -31,183 +34,192 @@ def reproject_layer_if_needed(layer_path, target_sr, layer_name):
     return layer_path
 
 # ------------------------------------
-# Function to validate coordinate system consistency
+# Main hexagon accessibility function
 # ------------------------------------
-def validate_crs_consistency(layers, layer_names):
+def calculate_hex_accessibility(hex_layer, pop_points_input, access_polygon, pop_field,
+                                output_hex_layer, ratio_threshold):
     """
-    Validates that all input layers share the same coordinate system.
+    Summarizes address points and population per hexagon and the share of them
+    inside the accessibility polygon. Without a population field, point counts are used.
     """
-    if not layers or len(layers) < 2:
-        return None
-    
-    # Collect spatial references from all valid layers.
-    spatial_refs = []
-    for i, layer in enumerate(layers):
-        if arcpy.Exists(layer):
-            desc = arcpy.Describe(layer)
-            if desc.spatialReference:
-                spatial_refs.append((desc.spatialReference, layer_names[i]))
-    
-    if not spatial_refs:
-        return None
-    
-    # Compare each layer's CRS to the first one.
-    reference_sr, reference_name = spatial_refs[0]
-    for sr, name in spatial_refs[1:]:
-        if sr.factoryCode != reference_sr.factoryCode:
-            raise arcpy.ExecuteError(f"Coordinate system mismatch between '{reference_name}' and '{name}'.")
-    
-    return reference_sr
-
-# ------------------------------------
-# Get input parameters
-# ------------------------------------
-hex_layer        = arcpy.GetParameterAsText(0)
-pop_points_input = arcpy.GetParameterAsText(1)
-access_polygon   = arcpy.GetParameterAsText(2)
-pop_field        = arcpy.GetParameterAsText(3)
-output_hex_layer = arcpy.GetParameterAsText(4)
-ratio_threshold  = float(arcpy.GetParameterAsText(5) or 0)
-
-# Define temporary layer paths.
-points_single  = "in_memory/points_single"
-points_flagged = "in_memory/points_with_access"
-
-# ------------------------------------
-# Header log
-# ------------------------------------
-arcpy.AddMessage("\n===================================================")
-arcpy.AddMessage("===   HEXAGON POPULATION ACCESSIBILITY START   ===")
-arcpy.AddMessage("===================================================")
-arcpy.AddMessage(f"Input hexagons:        {hex_layer}")
-arcpy.AddMessage(f"Address points:        {pop_points_input}")
-arcpy.AddMessage(f"Accessibility polygon: {access_polygon}")
-arcpy.AddMessage("---------------------------------------------------")
-
-# --- Validate inputs ---
-if not arcpy.Exists(hex_layer): raise arcpy.ExecuteError("Input hexagon layer does not exist.")
-if not arcpy.Exists(pop_points_input): raise arcpy.ExecuteError("Address points layer does not exist.")
-if not arcpy.Exists(access_polygon): raise arcpy.ExecuteError("Accessibility polygon does not exist.")
-
-# --- Ensure all layers use the same coordinate system ---
-hex_desc = arcpy.Describe(hex_layer)
-target_sr = hex_desc.spatialReference
-pop_points_reprojected = reproject_layer_if_needed(pop_points_input, target_sr, "Address_points")
-access_polygon_reprojected = reproject_layer_if_needed(access_polygon, target_sr, "Accessibility_polygon")
-validate_crs_consistency(
-    [hex_layer, pop_points_reprojected, access_polygon_reprojected],
-    ["Hexagon layer", "Address points layer", "Accessibility polygon"]
-)
-arcpy.AddMessage(f"Coordinate system validated: {target_sr.name}")
-
-# --- Validate population field if provided ---
-if pop_field:
-    input_fields = [f.name for f in arcpy.ListFields(pop_points_input)]
-    if pop_field not in input_fields:
-        raise arcpy.ExecuteError(f"Population field '{pop_field}' not found in the input points layer.")
+    # ------------------------------------
+    # Header log
+    # ------------------------------------
+    arcpy.AddMessage("\n===================================================")
+    arcpy.AddMessage("===   HEXAGON POPULATION ACCESSIBILITY START   ===")
+    arcpy.AddMessage("===================================================")
+    arcpy.AddMessage(f"Input hexagons:        {hex_layer}")
+    arcpy.AddMessage(f"Address points:        {pop_points_input}")
+    arcpy.AddMessage(f"Accessibility polygon: {access_polygon}")
+    arcpy.AddMessage("---------------------------------------------------")
+
+    # --- Validate inputs ---
+    if not arcpy.Exists(hex_layer): raise arcpy.ExecuteError("Input hexagon layer does not exist.")
+    if not arcpy.Exists(pop_points_input): raise arcpy.ExecuteError("Address points layer does not exist.")
+    if not arcpy.Exists(access_polygon): raise arcpy.ExecuteError("Accessibility polygon does not exist.")
+
+    # Temporary data is removed in the finally block, also when the analysis fails.
+    temp_layers = []
+    try:
+        # --- Ensure all layers use the same coordinate system ---
+        # Each input is described once; reprojection guarantees the shared CRS, so no second check is needed.
+        hex_desc = arcpy.Describe(hex_layer)
+        target_sr = hex_desc.spatialReference
+        points_desc = arcpy.Describe(pop_points_input)
+        access_desc = arcpy.Describe(access_polygon)
+        pop_points_reprojected = reproject_layer_if_needed(pop_points_input, points_desc.spatialReference, target_sr, "Address_points")
+        access_polygon_reprojected = reproject_layer_if_needed(access_polygon, access_desc.spatialReference, target_sr, "Accessibility_polygon")
+        temp_layers.extend(layer for layer in [pop_points_reprojected, access_polygon_reprojected]
+                           if layer not in (pop_points_input, access_polygon))
+        arcpy.AddMessage(f"Coordinate system validated: {target_sr.name}")
+
+        # --- Validate population field if provided ---
+        if pop_field:
+            input_fields = {f.name: f for f in arcpy.ListFields(pop_points_input)}
+            if pop_field not in input_fields:
+                raise arcpy.ExecuteError(f"Population field '{pop_field}' not found in the input points layer.")
     
-    field_info = arcpy.ListFields(pop_points_input, pop_field)[0]
-    if field_info.type not in ["Double", "Float", "Single", "Integer", "SmallInteger"]:
-        arcpy.AddWarning(f"Population field '{pop_field}' is not a numeric type.")
-    else:
-        arcpy.AddMessage(f"Population field validated: '{pop_field}'")
-
-# --- Convert multipoint features to single points ---
-desc = arcpy.Describe(pop_points_reprojected)
-if desc.shapeType == "Multipoint":
-    arcpy.AddMessage("Converting multipoint features to single points...")
-    arcpy.MultipartToSinglepart_management(pop_points_reprojected, points_single)
-else:
-    arcpy.CopyFeatures_management(pop_points_reprojected, points_single)
-
-# --- Flag points within the accessibility polygon using a Spatial Join ---
-arcpy.AddMessage("Flagging points within the accessibility area...")
-arcpy.analysis.SpatialJoin(
-    target_features=points_single, join_features=access_polygon_reprojected,
-    out_feature_class=points_flagged, join_type="KEEP_ALL", match_option="INTERSECT"
-)
-
-# --- Add a 'has_access' field (1 for accessible, 0 for not) ---
-arcpy.AddField_management(points_flagged, "has_access", "SHORT")
-with arcpy.da.UpdateCursor(points_flagged, ["Join_Count", "has_access"]) as cursor:
-    for row in cursor:
-        row[1] = 1 if row[0] and row[0] > 0 else 0
-        cursor.updateRow(row)
-arcpy.AddMessage("Address points flagged for accessibility.")
-
-# ------------------------------------
-# Summarize points and population within hexagons
-# ------------------------------------
-arcpy.AddMessage("Summarizing data within hexagons...")
-sum_fields = []
-if pop_field:
-    # Create a temporary field to hold the population of accessible points only.
-    arcpy.management.AddField(points_flagged, "accessible_pop", "DOUBLE")
-    arcpy.management.CalculateField(points_flagged, "accessible_pop", f"!{pop_field}! if !has_access! == 1 else 0", "PYTHON3")
-    sum_fields = [[pop_field, "SUM"], ["accessible_pop", "SUM"], ["has_access", "SUM"]]
-else:
-    sum_fields = [["has_access", "SUM"]]
-
-# Use SummarizeWithin for efficient aggregation.
-arcpy.analysis.SummarizeWithin(
-    in_polygons=hex_layer, in_sum_features=points_flagged,
-    out_feature_class=output_hex_layer, keep_all_polygons="KEEP_ALL",
-    sum_fields=sum_fields, add_group_percent="NO_PERCENT"
-)
-arcpy.AddMessage("Aggregation complete.")
-
-# ------------------------------------
-# Rename and calculate final output fields
-# ------------------------------------
-arcpy.AddMessage("Calculating final statistics...")
-# Rename fields generated by SummarizeWithin for clarity.
-field_mappings = {"Point_Count": "Total_Points", f"Sum_{pop_field}": "Total_Population",
-                  "Sum_accessible_pop": "Accessible_Population", "Sum_has_access": "Points_With_Access"}
-if not pop_field:
-    field_mappings["Sum_has_access"] = "Accessible_Points"
-
-for old_name, new_name in field_mappings.items():
-    if arcpy.ListFields(output_hex_layer, old_name):
-        arcpy.management.AlterField(output_hex_layer, old_name, new_name, new_name)
-
-# --- Define and add any missing fields ---
-needed_fields = { "Accessibility_Percent": "DOUBLE", "Points_Without_Access": "LONG", "Above_Threshold": "SHORT" }
-if pop_field:
-    needed_fields.update({"Total_Population": "DOUBLE", "Accessible_Population": "DOUBLE", "Points_With_Access": "LONG"})
-else:
-    needed_fields.update({"Total_Points": "LONG", "Accessible_Points": "LONG"})
-
-for field, ftype in needed_fields.items():
-    if not arcpy.ListFields(output_hex_layer, field):
-        arcpy.management.AddField(output_hex_layer, field, ftype)
-
-# --- Calculate final derived fields ---
-if pop_field:
-    arcpy.management.CalculateField(output_hex_layer, "Points_Without_Access", "!Total_Points! - !Points_With_Access!", "PYTHON3")
-    arcpy.management.CalculateField(output_hex_layer, "Accessibility_Percent", "(!Accessible_Population! / !Total_Population!) * 100 if !Total_Population! > 0 else 0", "PYTHON3")
-else:
-    arcpy.management.CalculateField(output_hex_layer, "Points_Without_Access", "!Total_Points! - !Accessible_Points!", "PYTHON3")
-    arcpy.management.CalculateField(output_hex_layer, "Accessibility_Percent", "(!Accessible_Points! / !Total_Points!) * 100 if !Total_Points! > 0 else 0", "PYTHON3")
-
-# Calculate whether the hexagon is above the specified threshold.
-arcpy.management.CalculateField(output_hex_layer, "Above_Threshold", f"1 if !Accessibility_Percent! >= {ratio_threshold} else 0", "PYTHON3")
-arcpy.AddMessage("Final statistics calculated.")
-
-# ------------------------------------
-# Clean up temporary data
-# ------------------------------------
-arcpy.AddMessage("Cleaning up temporary data...")
-for item in [points_single, points_flagged, "points_lyr"]:
-    if arcpy.Exists(item):
-        arcpy.management.Delete(item)
-
-# ------------------------------------
-# Footer log
-# ------------------------------------
-arcpy.AddMessage("\n===================================================")
-arcpy.AddMessage("===  HEXAGON POPULATION ACCESSIBILITY COMPLETED ===")
-arcpy.AddMessage("===================================================")
-arcpy.AddMessage(f"Final layer saved to: {output_hex_layer}")
+            field_info = input_fields[pop_field]
+            if field_info.type not in ["Double", "Float", "Single", "Integer", "SmallInteger"]:
+                arcpy.AddWarning(f"Population field '{pop_field}' is not a numeric type.")
+            else:
+                arcpy.AddMessage(f"Population field validated: '{pop_field}'")
+
+        # --- Choose where to stage the point copies ---
+        point_count = int(arcpy.management.GetCount(pop_points_reprojected)[0])
+        temp_workspace = arcpy.env.scratchGDB if point_count > LARGE_POINT_COUNT else "memory"
+        if temp_workspace != "memory":
+            arcpy.AddMessage(f"{point_count:,} points: staging temporary data in {temp_workspace}")
+        points_flagged = os.path.join(temp_workspace, "points_with_access")
+        temp_layers.extend([points_flagged, "points_layer"])
+
+        # --- Copy the points, converting multipoint features to single points ---
+        # The copy is the only point write; the input itself is never modified.
+        # Project keeps the geometry type, so the input description still applies.
+        # Points outside the hexagon extent can never be summarized, so the extent environment drops them here.
+        with arcpy.EnvManager(extent=hex_desc.extent):
+            if points_desc.shapeType == "Multipoint":
+                arcpy.AddMessage("Converting multipoint features to single points...")
+                arcpy.MultipartToSinglepart_management(pop_points_reprojected, points_flagged)
+            else:
+                arcpy.CopyFeatures_management(pop_points_reprojected, points_flagged)
+
+        # --- Flag points within the accessibility polygon using a location selection ---
+        arcpy.AddMessage("Flagging points within the accessibility area...")
+        arcpy.management.MakeFeatureLayer(points_flagged, "points_layer")
+        arcpy.management.SelectLayerByLocation("points_layer", "INTERSECT", access_polygon_reprojected)
+
+        # --- Add a 'has_access' field (1 for accessible, 0 for not) ---
+        # Cursors on the layer honour the selection, so its OIDs are the accessible points.
+        # The flag is set for all points at once and written back in one ExtendTable call.
+        selected_oids = arcpy.da.TableToNumPyArray("points_layer", ["OID@"])["OID@"]
+        arcpy.management.SelectLayerByAttribute("points_layer", "CLEAR_SELECTION")
+        point_oids = arcpy.da.TableToNumPyArray(points_flagged, ["OID@"])["OID@"]
+        access_flags = np.zeros(len(point_oids), dtype=[("point_oid", np.int32), ("has_access", np.int16)])
+        access_flags["point_oid"] = point_oids
+        access_flags["has_access"] = np.isin(point_oids, selected_oids)
+        arcpy.da.ExtendTable(points_flagged, "OID@", access_flags, "point_oid", append_only=False)
+        arcpy.AddMessage("Address points flagged for accessibility.")
+
+        # --- Select the population or count-only field layout once ---
+        if pop_field:
+            sum_fields = [[pop_field, "SUM"], ["accessible_pop", "SUM"], ["has_access", "SUM"]]
+            field_mappings = {"Point_Count": "Total_Points", f"Sum_{pop_field}": "Total_Population",
+                              "Sum_accessible_pop": "Accessible_Population", "Sum_has_access": "Points_With_Access"}
+            count_fields = {"Total_Population": "DOUBLE", "Accessible_Population": "DOUBLE", "Points_With_Access": "LONG"}
+            with_access_field, total_field, access_field = "Points_With_Access", "Total_Population", "Accessible_Population"
+        else:
+            sum_fields = [["has_access", "SUM"]]
+            field_mappings = {"Point_Count": "Total_Points", "Sum_has_access": "Accessible_Points"}
+            count_fields = {"Total_Points": "LONG", "Accessible_Points": "LONG"}
+            with_access_field, total_field, access_field = "Accessible_Points", "Total_Points", "Accessible_Points"
+
+        # ------------------------------------
+        # Summarize points and population within hexagons
+        # ------------------------------------
+        arcpy.AddMessage("Summarizing data within hexagons...")
+        if pop_field:
+            # Create a temporary field to hold the population of accessible points only.
+            arcpy.management.AddField(points_flagged, "accessible_pop", "DOUBLE")
+            arcpy.management.CalculateField(points_flagged, "accessible_pop", f"!{pop_field}! if !has_access! == 1 else 0", "PYTHON3")
+
+        # Use SummarizeWithin for efficient aggregation.
+        arcpy.analysis.SummarizeWithin(
+            in_polygons=hex_layer, in_sum_features=points_flagged,
+            out_feature_class=output_hex_layer, keep_all_polygons="KEEP_ALL",
+            sum_fields=sum_fields, add_group_percent="NO_PERCENT"
+        )
+        arcpy.AddMessage("Aggregation complete.")
+
+        # ------------------------------------
+        # Rename and calculate final output fields
+        # ------------------------------------
+        arcpy.AddMessage("Calculating final statistics...")
+        # Rename fields generated by SummarizeWithin for clarity.
+        # Field names are read once; keys are lower-case because SummarizeWithin may emit 'SUM_' rather than 'Sum_'.
+        output_fields = {f.name.lower(): f.name for f in arcpy.ListFields(output_hex_layer)}
+        for old_name, new_name in field_mappings.items():
+            actual_name = output_fields.pop(old_name.lower(), None)
+            if actual_name:
+                arcpy.management.AlterField(output_hex_layer, actual_name, new_name, new_name)
+                output_fields[new_name.lower()] = new_name
+
+        # --- Define and add any missing fields ---
+        needed_fields = { "Accessibility_Percent": "DOUBLE", "Points_Without_Access": "LONG", "Above_Threshold": "SHORT" }
+        needed_fields.update(count_fields)
+
+        for field, ftype in needed_fields.items():
+            if field.lower() not in output_fields:
+                arcpy.management.AddField(output_hex_layer, field, ftype)
+
+        # --- Calculate final derived fields ---
+        # All derived columns are computed from one table read and written back in one ExtendTable call.
+        read_fields = list(dict.fromkeys(["OID@", "Total_Points", with_access_field, total_field, access_field]))
+        hex_stats = arcpy.da.TableToNumPyArray(output_hex_layer, read_fields, null_value=0)
+        totals = hex_stats[total_field].astype(np.float64)
+        percent = np.divide(hex_stats[access_field] * 100.0, totals, out=np.zeros(len(hex_stats)), where=totals > 0)
+
+        derived = np.zeros(len(hex_stats), dtype=[("hex_oid", np.int32), ("Points_Without_Access", np.int32),
+                                                  ("Accessibility_Percent", np.float64), ("Above_Threshold", np.int16)])
+        derived["hex_oid"] = hex_stats["OID@"]
+        derived["Points_Without_Access"] = hex_stats["Total_Points"] - hex_stats[with_access_field]
+        derived["Accessibility_Percent"] = percent
+        # Whether the hexagon is above the specified threshold.
+        derived["Above_Threshold"] = percent >= ratio_threshold
+        arcpy.da.ExtendTable(output_hex_layer, "OID@", derived, "hex_oid", append_only=False)
+        arcpy.AddMessage("Final statistics calculated.")
+
+    finally:
+        # ------------------------------------
+        # Clean up temporary data
+        # ------------------------------------
+        arcpy.AddMessage("Cleaning up temporary data...")
+        for item in temp_layers:
+            if arcpy.Exists(item):
+                arcpy.management.Delete(item)
+
+    # ------------------------------------
+    # Footer log
+    # ------------------------------------
+    arcpy.AddMessage("\n===================================================")
+    arcpy.AddMessage("===  HEXAGON POPULATION ACCESSIBILITY COMPLETED ===")
+    arcpy.AddMessage("===================================================")
+    arcpy.AddMessage(f"Final layer saved to: {output_hex_layer}")
+
+# ------------------------------------
+# Script entry point
+# ------------------------------------
+if __name__ == "__main__":
+    # --- Get parameters from ArcGIS tool ---
+    hex_layer        = arcpy.GetParameterAsText(0)
+    pop_points_input = arcpy.GetParameterAsText(1)
+    access_polygon   = arcpy.GetParameterAsText(2)
+    pop_field        = arcpy.GetParameterAsText(3)
+    output_hex_layer = arcpy.GetParameterAsText(4)
+    ratio_threshold  = float(arcpy.GetParameterAsText(5) or 0)
+
+    calculate_hex_accessibility(hex_layer, pop_points_input, access_polygon, pop_field,
+                                output_hex_layer, ratio_threshold)
 
 # Author: Petr Mikeska
 # Bachelor thesis (2025)